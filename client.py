@@ -3,11 +3,23 @@ import asyncio
 import sys
 import os
 import json
-from typing import List, Dict, Any, Optional
+import hashlib
+import time
+import logging
+from typing import List, Dict, Any, Mapping, Optional
+
+import anyio
+
+# orjson is optional; it only speeds up pretty-printing tool results for the log
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # MCP Imports
 from mcp import ClientSession, StdioServerParameters, types as mcp_types
-from mcp.client.stdio import stdio_client
+from mcp.client.stdio import stdio_client, get_default_environment
+from mcp.shared.exceptions import McpError
 
 # Gemini Imports
 import google.generativeai as genai
@@ -25,41 +37,62 @@ if not GEMINI_API_KEY:
     print("Error: GEMINI_API_KEY not found in .env file.")
     sys.exit(1)
 
+# Diagnostics go to stderr through a logger (level from LOG_LEVEL); stdout is kept for the conversation
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+if not isinstance(logging.getLevelName(LOG_LEVEL), int):
+    LOG_LEVEL = "INFO" # Unknown level names fall back instead of crashing setLevel (and the server)
+logger = logging.getLogger("mcp-client")
+_log_handler = logging.StreamHandler(sys.stderr)
+_log_handler.setFormatter(logging.Formatter("[Client] %(message)s"))
+logger.addHandler(_log_handler)
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+
 genai.configure(api_key=GEMINI_API_KEY)
 # Using a model known to support function calling well
 gemini_model = genai.GenerativeModel(model_name="gemini-1.5-flash")
 
 # --- Helper Function to Convert MCP Tool Schema to Gemini FunctionDeclaration ---
+# Maps JSON Schema types to Gemini parameter types (anything else falls back to STRING)
+_TYPE_MAP = {
+    'number': "NUMBER",
+    'integer': "INTEGER",
+    'boolean': "BOOLEAN",
+    'string': "STRING",
+    'array': "ARRAY",
+    'object': "OBJECT",
+}
+
+# Converted declarations keyed by a hash of the tool's name, description and input schema.
+# A tool whose schema changes hashes to a new key, so stale conversions are never reused.
+_GEMINI_FN_CACHE: Dict[str, FunctionDeclaration] = {}
+
+def _tool_cache_key(mcp_tool: mcp_types.Tool) -> str:
+    """Returns a stable hash identifying an MCP tool's name, description and input schema."""
+    digest = hashlib.blake2b(json.dumps(mcp_tool.inputSchema, sort_keys=True).encode())
+    digest.update(b"\0" + mcp_tool.name.encode())
+    digest.update(b"\0" + (mcp_tool.description or "").encode())
+    return digest.hexdigest()
+
 def mcp_tool_to_gemini_function(mcp_tool: mcp_types.Tool) -> FunctionDeclaration:
-    """Converts an MCP Tool schema to a Gemini FunctionDeclaration."""
+    """Converts an MCP Tool schema to a Gemini FunctionDeclaration (cached per tool schema)."""
+    cache_key = _tool_cache_key(mcp_tool)
+    cached = _GEMINI_FN_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
     properties = {}
     required = []
     if mcp_tool.inputSchema and 'properties' in mcp_tool.inputSchema:
+        type_map = _TYPE_MAP
         for name, schema in mcp_tool.inputSchema['properties'].items():
-            param_type = "STRING" # Default
-            schema_type = schema.get('type')
-
-            if schema_type == 'number':
-                param_type = "NUMBER"
-            elif schema_type == 'integer':
-                param_type = "INTEGER"
-            elif schema_type == 'boolean':
-                param_type = "BOOLEAN"
-            elif schema_type == 'string':
-                param_type = "STRING"
-            elif schema_type == 'array':
-                param_type = "ARRAY"
-            elif schema_type == 'object':
-                 param_type = "OBJECT"
-
-            prop_definition = {
-                "type": param_type,
-                "description": schema.get('description', '')
+            properties[name] = {
+                "type": type_map.get(schema.get('type'), "STRING"),
+                "description": schema.get('description') or ""
             }
-            properties[name] = prop_definition
         required = mcp_tool.inputSchema.get('required', [])
 
-    return FunctionDeclaration(
+    function_declaration = FunctionDeclaration(
         name=mcp_tool.name,
         description=mcp_tool.description or "",
         parameters={
@@ -68,185 +101,420 @@ def mcp_tool_to_gemini_function(mcp_tool: mcp_types.Tool) -> FunctionDeclaration
             "required": required,
         },
     )
+    _GEMINI_FN_CACHE[cache_key] = function_declaration
+    return function_declaration
 # ---------------------------------------------------------------------------
 
+# Batch mode settings (python client.py <server> --batch < queries.txt)
+def _positive_int_env(name: str, default: int) -> int:
+    """Reads a positive integer setting, logging an error and falling back on bad values."""
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        logger.error("%s must be an integer, got %r; using %d.", name, raw, default)
+        return default
+    if value < 1:
+        # Zero workers would silently drop every query; a zero rate would never send
+        logger.error("%s must be at least 1, got %d; using 1.", name, value)
+        return 1
+    return value
+
+BATCH_WORKERS = _positive_int_env("BATCH_WORKERS", 4)
+GEMINI_MAX_QPM = _positive_int_env("GEMINI_MAX_QPM", 15)
+
+class _RateLimiter:
+    """Spaces out request starts so at most `max_per_minute` are issued per minute."""
+    def __init__(self, max_per_minute: int):
+        self._interval = 60.0 / max(1, max_per_minute)
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self._interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+# How long a discovered tool list stays fresh; reconnecting within this window skips list_tools()
+TOOLS_TTL_SECONDS = float(os.getenv("MCP_TOOLS_TTL", "300"))
+
+def _is_connection_lost(error: BaseException) -> bool:
+    """Returns True if an error means the stdio connection to the MCP server is gone."""
+    if isinstance(error, (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)):
+        return True
+    return isinstance(error, McpError) and error.error.code == getattr(mcp_types, "CONNECTION_CLOSED", -32000)
+
+class McpClientContext:
+    """
+    Owns the MCP server connection and the Gemini tool list derived from it.
+
+    The stdio transport and ClientSession live in a background task so they can be
+    torn down and recreated after a lost connection without touching the Gemini
+    model or any chat history. Meant to be shared by every chat (and batch worker).
+    """
+    def __init__(self, server_params: StdioServerParameters, tools_ttl: float = TOOLS_TTL_SECONDS):
+        self.server_params = server_params
+        self.tools_ttl = tools_ttl
+        self.session: Optional[ClientSession] = None
+        self.available_mcp_tools: List[mcp_types.Tool] = []
+        self.gemini_tools_list: List[GeminiTool] = []
+        # Keyword arguments for send_message_async, rebuilt only when the tool list changes
+        self.tools_kwarg: Dict[str, Any] = {}
+        self.tool_name_set: frozenset = frozenset()
+        self._tools_fetched_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._connection_task: Optional[asyncio.Task] = None
+        self._disconnect: Optional[asyncio.Event] = None
+
+    async def __aenter__(self) -> "McpClientContext":
+        await self._connect()
+        await self.refresh_tools()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._close()
+
+    async def _serve_connection(self, ready: asyncio.Future, disconnect: asyncio.Event):
+        # 4. Connect to Server using stdio_client context manager
+        try:
+            async with stdio_client(self.server_params) as (read_stream, write_stream):
+                logger.debug("Stdio transport established.")
+
+                # 5. Create and Initialize MCP Client Session
+                async with ClientSession(read_stream, write_stream) as session:
+                    logger.debug("Initializing MCP session...")
+                    await session.initialize()
+                    logger.info("MCP Session Initialized.")
+                    self.session = session
+                    ready.set_result(session)
+                    await disconnect.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.warning("MCP connection closed: %s", e)
+        finally:
+            self.session = None
+
+    async def _connect(self):
+        self._disconnect = asyncio.Event()
+        ready = asyncio.get_running_loop().create_future()
+        self._connection_task = asyncio.create_task(self._serve_connection(ready, self._disconnect))
+        await ready
+
+    async def _close(self):
+        if self._connection_task is not None:
+            self._disconnect.set()
+            await asyncio.gather(self._connection_task, return_exceptions=True)
+            self._connection_task = None
+
+    async def reconnect(self, stale_session: Optional[ClientSession]) -> ClientSession:
+        """Recreates the transport and session, unless another caller already replaced `stale_session`."""
+        async with self._lock:
+            if self.session is None or self.session is stale_session:
+                logger.warning("Reconnecting to MCP server...")
+                await self._close()
+                await self._connect()
+                await self.refresh_tools()
+            return self.session
+
+    async def refresh_tools(self, force: bool = False):
+        """Lists the server's tools and converts them for Gemini, unless the cached list is still fresh."""
+        if not force and self._tools_fetched_at is not None and time.monotonic() - self._tools_fetched_at < self.tools_ttl:
+            return
+
+        # 6. Discover Available Tools from the Server
+        logger.debug("Discovering tools from server...")
+        try:
+            list_tools_result: mcp_types.ListToolsResult = await self.session.list_tools()
+            self.available_mcp_tools = list_tools_result.tools
+            self._tools_fetched_at = time.monotonic()
+
+            # Log Discovered Tools (stderr, so they never mix into --batch results on stdout)
+            if self.available_mcp_tools:
+                logger.info("-" * 20)
+                logger.info("Available Tools from this Server:")
+                for tool in self.available_mcp_tools:
+                    logger.info("  - Name: %s", tool.name)
+                    logger.info("    Description: %s", tool.description or 'No description')
+                logger.info("-" * 20)
+            else:
+                logger.warning("No tools discovered from this server.")
+        except Exception as e:
+            logger.error("Error listing tools: %s", e)
+
+        # 7. Convert MCP Tools to Gemini Tools format
+        gemini_functions = [mcp_tool_to_gemini_function(tool) for tool in self.available_mcp_tools]
+        self.tool_name_set = frozenset(tool.name for tool in self.available_mcp_tools)
+        if gemini_functions:
+            # Create the Tool object for Gemini
+            self.gemini_tools_list = [GeminiTool(function_declarations=gemini_functions)]
+            logger.debug("Converted MCP tools for Gemini.")
+        else:
+            self.gemini_tools_list = []
+            logger.debug("No tools discovered or converted for Gemini.")
+        self.tools_kwarg = {"tools": self.gemini_tools_list} if self.gemini_tools_list else {}
+
+    async def call_tool(self, name: str, arguments: Mapping[str, Any]) -> mcp_types.CallToolResult:
+        """
+        Calls an MCP tool, reconnecting and retrying once if the server connection was lost.
+
+        The retry sends the same call again, so a tool whose first attempt reached the server
+        before the connection dropped can run twice. That is only safe for idempotent tools
+        (such as this project's text analysis tools).
+
+        Only failures the MCP library reports as a lost connection are retried. With the
+        pinned mcp 1.6.0 that means calls made after the server went away; a call already
+        in flight when the server dies is not failed by the library and is not retried.
+        """
+        session = self.session
+        try:
+            if session is None:
+                raise anyio.ClosedResourceError()
+            return await session.call_tool(name, arguments)
+        except Exception as e:
+            if not _is_connection_lost(e):
+                raise
+            logger.warning("MCP connection lost (%s).", type(e).__name__)
+            session = await self.reconnect(session)
+            return await session.call_tool(name, arguments)
+
+def _pretty_json(text: str) -> str:
+    """Re-indents a JSON string for display (raises ValueError if it is not JSON)."""
+    if orjson is not None:
+        return orjson.dumps(orjson.loads(text), option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(json.loads(text), indent=2)
+
+def _function_response_part(tool_name: str, content: str) -> Dict[str, Any]:
+    """Builds a function_response part for Gemini Chat."""
+    # A plain dict is converted with a single protos.Part(...) call inside the SDK, which
+    # benchmarks faster than building protos.Part/protos.FunctionResponse by hand.
+    return {"function_response": {"name": tool_name, "response": {"content": content}}}
+
+async def run_tool_call(ctx: McpClientContext, function_call) -> Dict[str, Any]:
+    """Runs one Gemini function call on the MCP server and returns its function_response part (an error message if the call failed)."""
+    tool_name = function_call.name
+    # The proto map is already a Mapping; the MCP request model copies it into a dict itself
+    tool_args = function_call.args
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Gemini requested tool call: %s(%s)", tool_name, dict(tool_args))
+
+    # Reject tools the server never advertised without a round trip to the server
+    if tool_name not in ctx.tool_name_set:
+        logger.warning("Gemini requested unknown tool '%s'; not calling the server.", tool_name)
+        return _function_response_part(tool_name, f"Error: Unknown tool: {tool_name}")
+
+    # 12. Call the MCP Tool via the shared context (reconnects if the server went away)
+    logger.debug("Calling MCP tool '%s'...", tool_name)
+    try:
+        tool_call_result: mcp_types.CallToolResult = await ctx.call_tool(tool_name, tool_args)
+    except Exception as tool_err:
+        logger.error("Error calling MCP tool '%s': %s", tool_name, tool_err)
+        # Pass the real failure on so the model can respond to it
+        return _function_response_part(tool_name, f"Error: {tool_err}")
+
+    # Process result content
+    result_content_str = "Error: Tool executed but no parsable content returned."
+    tool_failed = tool_call_result.isError
+    # MCP guarantees content is a list, so a truthiness check covers "present and non-empty"
+    content = tool_call_result.content
+    if content:
+        first_text = getattr(content[0], 'text', None) # Only TextContent carries .text
+        if first_text is not None:
+            result_content_str = first_text
+    elif tool_failed: result_content_str = "Tool execution failed on server."
+
+    # Pretty-print JSON for the local log only; Gemini gets the original string
+    if logger.isEnabledFor(logging.DEBUG):
+        display_str = result_content_str
+        try:
+            display_str = _pretty_json(result_content_str)
+        except ValueError: pass
+        logger.debug("MCP Tool Result for '%s' (isError=%s): %s", tool_name, tool_failed, display_str)
+
+    # 13. Tool Result in the dictionary format Gemini Chat accepts
+    return _function_response_part(tool_name, result_content_str)
+
+# Rounds of function calls answered per query; calls beyond this are refused
+MAX_TOOL_ROUNDS = 5
+
+async def process_query(chat, ctx: McpClientContext, user_query: str, rate_limiter: Optional[_RateLimiter] = None) -> Optional[str]:
+    """Sends one user query through the Gemini chat, runs the MCP tools it requests (over up to MAX_TOOL_ROUNDS rounds), and returns the final reply text (None if there was none)."""
+    response = None
+    send_message = chat.send_message_async
+
+    async def send(content, **send_options):
+        # Every request to Gemini takes a rate limiter slot, including the tool-result follow-ups
+        if rate_limiter is not None:
+            await rate_limiter.wait()
+        return await send_message(content, **ctx.tools_kwarg, **send_options)
+
+    try:
+        logger.debug("Sending query to Gemini Chat...")
+        # 10. Send message to chat, including tools
+        response = await send(user_query)
+
+        # 11. Process response - Collect every function call requested in this turn
+        function_calls = [part.function_call for part in response.parts if part.function_call]
+        tool_rounds = 0
+
+        # Gemini may answer tool results with more calls (chained tool use), so keep going until it replies with text
+        while function_calls:
+            tool_rounds += 1
+            send_options = {}
+            if tool_rounds <= MAX_TOOL_ROUNDS:
+                # Run the calls concurrently: latency is the slowest call rather than the sum of all calls.
+                # Gemini expects one response per call (even if every call failed, or the chat history is
+                # left with an unanswered function call); run_tool_call reports failed calls as errors
+                function_responses = await asyncio.gather(*(run_tool_call(ctx, function_call) for function_call in function_calls))
+            else:
+                # Out of rounds: still answer every call, and disable function calling so the model must reply in text
+                logger.warning("Gemini still requested tools after %d rounds; refusing the remaining calls.", MAX_TOOL_ROUNDS)
+                function_responses = [
+                    _function_response_part(function_call.name, f"Error: Tool call limit of {MAX_TOOL_ROUNDS} rounds reached.")
+                    for function_call in function_calls
+                ]
+                send_options = {"tool_config": {"function_calling_config": {"mode": "NONE"}}}
+
+            logger.debug("Sending tool results back to Gemini Chat...")
+            # Send all function responses together, in the order the calls were requested
+            try:
+                response = await send(function_responses, **send_options)
+            except Exception as send_err:
+                logger.error("Error sending tool results to Gemini Chat: %s: %s", type(send_err).__name__, send_err)
+                return "Sorry, I encountered an error trying to use the tool."
+            if send_options:
+                break
+            function_calls = [part.function_call for part in response.parts if part.function_call]
+
+        # 14. Handle Direct Text Response
+        reply_text = "".join(part.text for part in response.parts if part.text)
+        if reply_text:
+            return reply_text
+        logger.warning("Received unexpected or empty response part from Gemini Chat.")
+        return None
+
+    except Exception as e:
+        # Catch potential errors during the Gemini API call itself
+        logger.error("Error during Gemini chat interaction: %s: %s", type(e).__name__, e)
+        # Safely check for feedback (structure might vary with chat)
+        try:
+             if response and response.prompt_feedback:
+                 logger.error("Gemini Prompt Feedback: %s", response.prompt_feedback)
+        except AttributeError: pass # Ignore if feedback structure isn't present
+        except Exception as inner_e: logger.error("Error accessing feedback: %s", inner_e)
+
+        # import traceback
+        # traceback.print_exc()
+        return "Sorry, an error occurred while processing your request with the language model."
+
+async def run_batch(ctx: McpClientContext, queries: List[str]):
+    """Answers queries concurrently with BATCH_WORKERS workers, rate limited to GEMINI_MAX_QPM."""
+    queue: asyncio.Queue = asyncio.Queue()
+    for index, query in enumerate(queries, start=1):
+        queue.put_nowait((index, query))
+    rate_limiter = _RateLimiter(GEMINI_MAX_QPM)
+
+    async def worker():
+        # Each worker owns its chat so concurrent queries never share history
+        chat = gemini_model.start_chat()
+        while True:
+            try:
+                index, query = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            reply = await process_query(chat, ctx, query, rate_limiter)
+            print(f"\n[Query {index}] {query}\nLLM Response:\n{reply or '(no text response)'}\n")
+
+    await asyncio.gather(*(worker() for _ in range(min(BATCH_WORKERS, len(queries)))))
+
+async def chat_loop(ctx: McpClientContext):
+    """Runs the interactive prompt until the user types 'quit'."""
+    # 8. Start Gemini Chat Session
+    # Tools are passed per message from the shared context.
+    # enable_automatic_function_calling=True might handle some steps, but we'll do it manually
+    # to ensure MCP is called. Let's keep it False or omit it for manual control.
+    chat = gemini_model.start_chat(
+        # history=[] # Start with empty history
+    )
+    print("\n--- MCP Client Ready (Using Gemini Chat) ---")
+    print("Enter your query, or type 'quit' to exit.")
+
+    # 9. Interactive Chat Loop
+    while True:
+        user_query = input("> ")
+        if user_query.lower() == 'quit':
+            break
+        if not user_query:
+            continue
+
+        reply = await process_query(chat, ctx, user_query)
+        if reply:
+            print(f"\nLLM Response:\n{reply}\n")
+
 async def main():
-    # 2. Get Server Path from Command Line Argument
+    # 2. Get Server Path (and optional --batch flag) from Command Line Arguments
     if len(sys.argv) < 2:
-        print("Usage: python client.py <path_to_server_script.py>")
+        print("Usage: python client.py <path_to_server_script.py> [--batch]")
         sys.exit(1)
     server_script_path = sys.argv[1]
-    print(f"[Client] Attempting to connect to server: {server_script_path}")
+    batch_mode = "--batch" in sys.argv[2:]
+    logger.info("Attempting to connect to server: %s", server_script_path)
 
     # 3. Setup MCP Connection Parameters
+    # The server inherits the client's log level; its logs are written to stderr
     server_params = StdioServerParameters(
         command="python",
         args=[server_script_path],
-        env=None
+        env={**get_default_environment(), "LOG_LEVEL": LOG_LEVEL}
     )
 
-    mcp_session: Optional[ClientSession] = None
-    gemini_tools_list: List[GeminiTool] = []
-    available_mcp_tools: List[mcp_types.Tool] = []
-
     try:
-        # 4. Connect to Server using stdio_client context manager
-        async with stdio_client(server_params) as (read_stream, write_stream):
-            print("[Client] Stdio transport established.")
-
-            # 5. Create and Initialize MCP Client Session
-            async with ClientSession(read_stream, write_stream) as session:
-                mcp_session = session
-                print("[Client] Initializing MCP session...")
-                await session.initialize()
-                print("[Client] MCP Session Initialized.")
-
-                # 6. Discover Available Tools from the Server
-                print("[Client] Discovering tools from server...")
-                try:
-                    list_tools_result: mcp_types.ListToolsResult = await session.list_tools()
-                    available_mcp_tools = list_tools_result.tools
-
-                    # Print Discovered Tools
-                    if available_mcp_tools:
-                        print("-" * 20)
-                        print("Available Tools from this Server:")
-                        for tool in available_mcp_tools:
-                            print(f"  - Name: {tool.name}")
-                            print(f"    Description: {tool.description or 'No description'}")
-                        print("-" * 20)
-                    else:
-                        print("[Client] No tools discovered from this server.")
-                except Exception as e:
-                    print(f"[Client] Error listing tools: {e}")
-
-                # 7. Convert MCP Tools to Gemini Tools format
-                gemini_functions = [mcp_tool_to_gemini_function(tool) for tool in available_mcp_tools]
-                if gemini_functions:
-                    # Create the Tool object for Gemini
-                    gemini_tools_list = [GeminiTool(function_declarations=gemini_functions)]
-                    print("[Client] Converted MCP tools for Gemini.")
-                else:
-                     print("[Client] No tools discovered or converted for Gemini.")
-
-                # 8. Start Gemini Chat Session
-                # Pass the prepared tools list here
-                # enable_automatic_function_calling=True might handle some steps, but we'll do it manually
-                # to ensure MCP is called. Let's keep it False or omit it for manual control.
-                chat = gemini_model.start_chat(
-                    # history=[] # Start with empty history
-                )
-                print("\n--- MCP Client Ready (Using Gemini Chat) ---")
-                print("Enter your query, or type 'quit' to exit.")
-
-                # 9. Interactive Chat Loop
-                while True:
-                    user_query = input("> ")
-                    if user_query.lower() == 'quit':
-                        break
-                    if not user_query:
-                        continue
-
-                    try:
-                        print("[Client] Sending query to Gemini Chat...")
-                        # 10. Send message to chat, including tools
-                        response = await chat.send_message_async(
-                            user_query,
-                            tools=gemini_tools_list if gemini_tools_list else None
-                        )
-
-                        # 11. Process response - Check for function call
-                        # Access parts correctly via response.parts
-                        response_part = response.parts[0] if response.parts else None
-
-                        if response_part and response_part.function_call:
-                            function_call = response_part.function_call
-                            tool_name = function_call.name
-                            tool_args = dict(function_call.args)
-
-                            print(f"[Client] Gemini requested tool call: {tool_name}({tool_args})")
-
-                            # 12. Call the MCP Tool via the Session
-                            if mcp_session:
-                                print(f"[Client] Calling MCP tool '{tool_name}'...")
-                                try:
-                                    tool_call_result: mcp_types.CallToolResult = await mcp_session.call_tool(tool_name, tool_args)
-
-                                    # Process result content
-                                    result_content_str = "Error: Tool executed but no parsable content returned."
-                                    tool_failed = tool_call_result.isError
-                                    if tool_call_result.content and isinstance(tool_call_result.content, list) and len(tool_call_result.content) > 0:
-                                        first_content = tool_call_result.content[0]
-                                        if isinstance(first_content, mcp_types.TextContent) and first_content.text is not None:
-                                            result_content_str = first_content.text
-                                            try:
-                                                parsed = json.loads(result_content_str)
-                                                result_content_str = json.dumps(parsed, indent=2)
-                                            except json.JSONDecodeError: pass
-                                    elif tool_failed: result_content_str = "Tool execution failed on server."
-
-                                    print(f"[Client] MCP Tool Result (isError={tool_failed}): {result_content_str}")
-
-                                    # 13. Send Tool Result back to Gemini Chat using dictionary format
-                                    print("[Client] Sending tool result back to Gemini Chat...")
-                                    function_response_dict = {
-                                        "function_response": {
-                                            "name": tool_name,
-                                            "response": {"content": result_content_str}
-                                        }
-                                    }
-                                    # Send the dictionary representing the function response
-                                    response = await chat.send_message_async(
-                                        function_response_dict, # Send the result dict
-                                        tools=gemini_tools_list if gemini_tools_list else None
-                                    )
-                                    # Get the final text part after processing the result
-                                    if response.parts and response.parts[0].text:
-                                        print(f"\nLLM Response:\n{response.parts[0].text}\n")
-                                    else:
-                                        print("[Client] Gemini Chat did not provide a final text response after tool call.")
-
-                                except Exception as tool_err:
-                                     print(f"[Client] Error calling MCP tool '{tool_name}': {tool_err}")
-                                     print("LLM Response: Sorry, I encountered an error trying to use the tool.")
-                            else:
-                                print("[Client] Error: MCP Session not available to call tool.")
-                                print("LLM Response: Sorry, I cannot currently use tools.")
-
-                        elif response_part and response_part.text:
-                            # 14. Handle Direct Text Response
-                            print(f"\nLLM Response:\n{response_part.text}\n")
-                        else:
-                             print("[Client] Received unexpected or empty response part from Gemini Chat.")
-
-                    except Exception as e:
-                        # Catch potential errors during the Gemini API call itself
-                        print(f"[Client] Error during Gemini chat interaction: {type(e).__name__}: {e}")
-                        # Safely check for feedback (structure might vary with chat)
-                        try:
-                             if response and response.prompt_feedback:
-                                 print(f"Gemini Prompt Feedback: {response.prompt_feedback}")
-                        except AttributeError: pass # Ignore if feedback structure isn't present
-                        except Exception as inner_e: print(f"[Client] Error accessing feedback: {inner_e}")
-
-                        print("LLM Response: Sorry, an error occurred while processing your request with the language model.")
-                        # import traceback
-                        # traceback.print_exc()
-
+        # 4-7. Connect, initialize the session, and discover tools once for the whole run
+        async with McpClientContext(server_params) as ctx:
+            # Batch mode: read all queries from stdin and answer them concurrently
+            if batch_mode:
+                queries = [line.strip() for line in sys.stdin if line.strip()]
+                logger.info("Batch mode: %d queries, %d workers, %d QPM limit.", len(queries), BATCH_WORKERS, GEMINI_MAX_QPM)
+                await run_batch(ctx, queries)
+            else:
+                await chat_loop(ctx)
 
     except ConnectionRefusedError:
-        print(f"[Client] Error: Connection refused. Is the server script path correct ('{server_script_path}') and is Python installed/runnable?")
+        logger.error("Error: Connection refused. Is the server script path correct ('%s') and is Python installed/runnable?", server_script_path)
     except FileNotFoundError:
-         print(f"[Client] Error: Server script not found at '{server_script_path}'. Please check the path.")
+         logger.error("Error: Server script not found at '%s'. Please check the path.", server_script_path)
     except Exception as e:
-        print(f"[Client] An unexpected error occurred: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("An unexpected error occurred: %s", e)
     finally:
-        print("[Client] Exiting.")
+        logger.info("Exiting.")
 
 
 if __name__ == "__main__":
-    if sys.platform == "win32":
-        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
-    asyncio.run(main())
\ No newline at end of file
+    # Create the event loop directly instead of installing a global loop policy:
+    # uvloop's libuv-backed loop when it is installed (not available on Windows),
+    # otherwise the Proactor loop on Windows and the default loop elsewhere
+    try:
+        import uvloop
+    except ImportError:
+        uvloop = None
+    if sys.version_info >= (3, 11):
+        if uvloop is not None:
+            loop_factory = uvloop.new_event_loop
+        else:
+            loop_factory = asyncio.ProactorEventLoop if sys.platform == "win32" else None
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            runner.run(main())
+    else:
+        # asyncio.Runner needs Python 3.11+, so fall back to uvloop's policy there;
+        # without uvloop the default loop is already Proactor on Windows
+        if uvloop is not None:
+            uvloop.install()
+        asyncio.run(main())
\ No newline at end of file
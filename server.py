@@ -1,7 +1,123 @@
 # server.py
 import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
 from mcp.server.fastmcp import FastMCP # Import the easy-to-use server framework
 import re # Import regex for sentence splitting
+import signal
+
+# NumPy is optional; it only speeds up word and sentence counting for large inputs
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# FastMCP starts its own event loop inside mcp.run(), so swap in uvloop's
+# loop policy at import time when it is available.
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
+# A sentence is a run of non-terminator text containing at least one
+# non-whitespace character (the text between runs of .?! delimiters).
+_SENTENCE_RE = re.compile(r'[^.?!\s][^.?!]*')
+
+# Server logs must go to stderr: stdout is the MCP stdio transport
+logger = logging.getLogger("TextAnalyzer")
+_log_handler = logging.StreamHandler(sys.stderr)
+_log_handler.setFormatter(logging.Formatter("[Server] %(message)s"))
+logger.addHandler(_log_handler)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+if not isinstance(logging.getLevelName(LOG_LEVEL), int):
+    LOG_LEVEL = "INFO" # Unknown level names fall back instead of crashing setLevel at startup
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+
+# Inputs longer than this are counted with a vectorized NumPy scan (when available)
+_VECTORIZED_MIN_CHARS = 8192
+
+def _use_vectorized(text: str) -> bool:
+    # The byte scans only mirror str methods for ASCII (non-ASCII text has extra whitespace characters)
+    return np is not None and len(text) > _VECTORIZED_MIN_CHARS and text.isascii()
+
+def _ascii_space_mask(data):
+    """Marks ASCII whitespace per str.isspace(): \\t\\n\\v\\f\\r, \\x1c-\\x1f and space."""
+    return (data == 0x20) | ((data >= 0x09) & (data <= 0x0d)) | ((data >= 0x1c) & (data <= 0x1f))
+
+def _count_words(text: str) -> int:
+    """Counts whitespace-separated words, matching len(text.split())."""
+    if not _use_vectorized(text):
+        return len(text.split())
+    is_space = _ascii_space_mask(np.frombuffer(text.encode('ascii'), dtype=np.uint8))
+    # A word starts at every non-space byte that follows a space (or begins the text)
+    return int(np.count_nonzero(is_space[:-1] & ~is_space[1:])) + (not is_space[0])
+
+def _count_sentences(text: str) -> int:
+    """Counts non-blank fragments between runs of .?! terminators."""
+    # Blank input has no sentences; text without terminators is a single sentence
+    if not text or text.isspace():
+        return 0
+    if '.' not in text and '?' not in text and '!' not in text:
+        return 1
+    if not _use_vectorized(text):
+        # Single regex pass, without building the intermediate list of split fragments
+        return sum(1 for _ in _SENTENCE_RE.finditer(text))
+    data = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+    # Whitespace never separates sentences, so drop it and look at the remaining bytes
+    data = data[~_ascii_space_mask(data)]
+    is_terminator = (data == ord('.')) | (data == ord('?')) | (data == ord('!'))
+    # A sentence starts at every non-terminator byte that follows a terminator (or begins the text)
+    return int(np.count_nonzero(is_terminator[:-1] & ~is_terminator[1:])) + (not is_terminator[0])
+
+# Inputs longer than this are counted in a worker process so a huge document
+# cannot stall the stdio event loop (smaller inputs finish faster inline than the IPC costs)
+_OFFLOAD_MIN_CHARS = 1_000_000
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _detach_worker_from_transport():
+    # Workers inherit the server's stdin/stdout, which are the MCP transport pipes; holding them
+    # open would keep the client from seeing the server exit, so point both at os.devnull
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+def _exit_on_sigterm(signum, frame):
+    # MCP clients stop the server with SIGTERM, which by default skips the interpreter's exit
+    # handlers; exit normally instead so the worker pool shuts down rather than orphaning its workers
+    raise SystemExit(128 + signum)
+
+def _get_executor() -> ProcessPoolExecutor:
+    # Created on first use, so servers that never see huge inputs never start worker processes
+    global _executor
+    if _executor is None:
+        # Spawn, never fork: a forked worker inherits sys.stdin (the MCP transport) while the
+        # transport's reader thread holds its lock, and deadlocks when it closes stdin on startup
+        _executor = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_detach_worker_from_transport)
+    return _executor
+
+async def _run_counter(counter: Callable[[str], int], text: str) -> int:
+    """Runs a counting function inline, or in the worker pool for very large inputs."""
+    global _executor
+    if len(text) <= _OFFLOAD_MIN_CHARS:
+        return counter(text)
+    executor = _get_executor()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, counter, text)
+    except BrokenProcessPool:
+        # A crashed worker breaks the whole pool; drop it so the next large input gets a fresh one
+        if _executor is executor:
+            _executor = None
+        executor.shutdown(wait=False)
+        raise
 
 # 1. Initialize FastMCP Server
 # We give it a name, "TextAnalyzer", which might be shown in client UIs.
@@ -16,16 +132,20 @@ async def analyze_text(text: str) -> dict:
     Args:
         text: The string of text to analyze.
     """
+    # Nothing to scan for empty input
+    if not text:
+        return {"word_count": 0, "char_count": 0}
+
     # Simple analysis logic
-    word_count = len(text.split())
+    word_count = await _run_counter(_count_words, text)
     char_count = len(text)
 
-    print(f"[Server] Analyzing text: '{text[:50]}...'") # Server-side log
+    logger.debug("Analyzing text: '%s...'", text[:50]) # Server-side log
     analysis_result = {
         "word_count": word_count,
         "char_count": char_count
     }
-    print(f"[Server] Analysis result: {analysis_result}")
+    logger.debug("Analysis result: %s", analysis_result)
     # FastMCP automatically serializes the dictionary return type into
     # the appropriate MCP TextContent JSON format for the client.
     return analysis_result
@@ -40,17 +160,15 @@ async def count_sentences(text: str) -> int:
     Args:
         text: The string of text to analyze.
     """
-    print(f"[Server] Counting sentences in: '{text[:50]}...'") # Server log
-    # Simple sentence split based on common terminators
-    sentences = re.split(r'[.?!]+', text)
-    # Filter out empty strings that might result from splitting
-    sentence_count = len([s for s in sentences if s.strip()])
-    print(f"[Server] Sentence count: {sentence_count}")
+    logger.debug("Counting sentences in: '%s...'", text[:50]) # Server log
+    sentence_count = await _run_counter(_count_sentences, text)
+    logger.debug("Sentence count: %s", sentence_count)
     # Return the count (an integer). FastMCP handles sending this back.
     return sentence_count
 
 # 4. Entry point to run the server
 if __name__ == "__main__":
-    print("[Server] Starting Text Analyzer MCP Server on stdio...")
+    logger.info("Starting Text Analyzer MCP Server on stdio...")
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
     # mcp.run() starts the server listening for MCP messages.
     mcp.run(transport='stdio')
\ No newline at end of file
@@ -0,0 +1,122 @@
+# test_client.py
+# Run with: python -m unittest test_client
+import asyncio
+import os
+import signal
+import sys
+import time
+import unittest
+import unittest.mock
+
+import anyio
+
+# client.py exits at import without a key; these tests never call Gemini
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from mcp import StdioServerParameters, types as mcp_types
+from mcp.shared.exceptions import McpError
+
+import client
+
+SERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+
+
+def _server_pids() -> list:
+    """Returns the PIDs of this process's server.py subprocesses (Linux only)."""
+    pids = []
+    for task in os.listdir(f"/proc/{os.getpid()}/task"):
+        with open(f"/proc/{os.getpid()}/task/{task}/children") as children:
+            pids.extend(int(pid) for pid in children.read().split())
+    server_pids = []
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as cmdline:
+                if SERVER_PATH.encode() in cmdline.read():
+                    server_pids.append(pid)
+        except FileNotFoundError:
+            pass
+    return server_pids
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            return stat.read().split(") ", 1)[1][0] != "Z" # Zombies have already exited
+    except FileNotFoundError:
+        return False
+
+
+class ConnectionLostTest(unittest.TestCase):
+    """Which errors McpClientContext treats as a lost connection."""
+
+    def test_stream_errors_are_connection_lost(self):
+        for error in (anyio.ClosedResourceError(), anyio.BrokenResourceError(), anyio.EndOfStream()):
+            with self.subTest(error=type(error).__name__):
+                self.assertTrue(client._is_connection_lost(error))
+
+    def test_other_errors_are_not(self):
+        self.assertFalse(client._is_connection_lost(ValueError("bad arguments")))
+        self.assertFalse(client._is_connection_lost(McpError(mcp_types.ErrorData(code=mcp_types.INVALID_PARAMS, message="bad"))))
+
+
+class PositiveIntEnvTest(unittest.TestCase):
+    """Batch settings are validated instead of dropping queries or crashing at import."""
+
+    def _read(self, raw):
+        with unittest.mock.patch.dict(os.environ, {"TEST_SETTING": raw}), self.assertLogs(client.logger, "ERROR"):
+            return client._positive_int_env("TEST_SETTING", 4)
+
+    def test_values_below_one_are_clamped(self):
+        self.assertEqual(self._read("0"), 1)
+        self.assertEqual(self._read("-2"), 1)
+
+    def test_non_integer_falls_back_to_default(self):
+        self.assertEqual(self._read("four"), 4)
+
+    def test_valid_and_missing_values(self):
+        with unittest.mock.patch.dict(os.environ, {"TEST_SETTING": "8"}):
+            self.assertEqual(client._positive_int_env("TEST_SETTING", 4), 8)
+        os.environ.pop("TEST_SETTING", None)
+        self.assertEqual(client._positive_int_env("TEST_SETTING", 4), 4)
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "finds the server subprocess through /proc")
+class ReconnectTest(unittest.TestCase):
+    """A killed server is replaced and the tool call still succeeds."""
+
+    async def _call_after_killing_server(self):
+        params = StdioServerParameters(command=sys.executable, args=[SERVER_PATH])
+        async with client.McpClientContext(params) as ctx:
+            before = await ctx.call_tool("analyze_text", {"text": "one two"})
+            old_session = ctx.session
+
+            pids = _server_pids()
+            self.assertEqual(len(pids), 1)
+            os.kill(pids[0], signal.SIGKILL)
+            deadline = time.monotonic() + 10
+            while _is_running(pids[0]) and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            self.assertFalse(_is_running(pids[0]))
+            # Wait until the transport has seen the server exit. A call sent before that is
+            # already in flight when the write fails, which mcp 1.6.0 never answers (see call_tool).
+            while not old_session._write_stream._closed and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+
+            after = await ctx.call_tool("analyze_text", {"text": "one two three"})
+            new_session = ctx.session
+            new_pids = _server_pids()
+        return before, after, old_session, new_session, pids[0], new_pids
+
+    def test_call_tool_reconnects_after_server_is_killed(self):
+        before, after, old_session, new_session, old_pid, new_pids = asyncio.run(
+            asyncio.wait_for(self._call_after_killing_server(), timeout=60))
+        self.assertIn('"word_count": 2', before.content[0].text)
+        self.assertFalse(after.isError)
+        self.assertIn('"word_count": 3', after.content[0].text)
+        self.assertIsNot(new_session, old_session)
+        self.assertEqual(len(new_pids), 1)
+        self.assertNotEqual(new_pids[0], old_pid)
+
+
+if __name__ == "__main__":
+    unittest.main()
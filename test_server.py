@@ -0,0 +1,143 @@
+# test_server.py
+# Run with: python -m unittest test_server
+import asyncio
+import os
+import re
+import signal
+import sys
+import threading
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+import server
+
+SERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+# Just past the threshold, so the tools run in the worker process pool
+LARGE_TEXT = ("One two three. Four five? " * (server._OFFLOAD_MIN_CHARS // 26 + 1))[:server._OFFLOAD_MIN_CHARS + 20_000]
+
+
+def _crash_worker(text: str) -> int:
+    # Kills the worker process outright, which breaks the whole pool
+    os._exit(1)
+
+
+def _baseline_sentences(text: str) -> int:
+    # The original count_sentences implementation
+    return len([s for s in re.split(r'[.?!]+', text) if s.strip()])
+
+
+def _baseline_words(text: str) -> int:
+    # The original analyze_text word count
+    return len(text.split())
+
+
+# Inputs for the fast paths and the regex/str.split paths
+SMALL_CASES = [
+    "",
+    "   ",
+    "Hello world",
+    ". .",
+    "First sentence. Trailing fragment",
+    "One.\x1cTwo!\x0bThree?",
+    "Word\x1cword\x0bword",
+    "Non\u00a0ASCII\u3000whitespace. Second\u2003one?!",
+    "...?!",
+    "  Lead. \n\t Gap ..  . end",
+]
+
+
+class CountingTest(unittest.TestCase):
+    """The counting helpers must agree with the original split/strip formulas on every path."""
+
+    def test_small_inputs_match_baseline(self):
+        for text in SMALL_CASES:
+            with self.subTest(text=text):
+                self.assertEqual(server._count_sentences(text), _baseline_sentences(text))
+                self.assertEqual(server._count_words(text), _baseline_words(text))
+
+    def test_fast_paths(self):
+        self.assertEqual(server._count_sentences(""), 0)
+        self.assertEqual(server._count_sentences("   "), 0)
+        self.assertEqual(server._count_sentences("Hello world"), 1)
+
+    def test_large_non_ascii_input_matches_baseline(self):
+        # Non-ASCII text always takes the regex/str.split path, whatever its length
+        text = "Caf\u00e9\u00a0au lait. Encore\u3000une? " * 1000
+        self.assertGreater(len(text), server._VECTORIZED_MIN_CHARS)
+        self.assertEqual(server._count_sentences(text), _baseline_sentences(text))
+        self.assertEqual(server._count_words(text), _baseline_words(text))
+
+    @unittest.skipIf(server.np is None, "NumPy is not installed")
+    def test_vectorized_paths_match_baseline(self):
+        self.assertTrue(server._use_vectorized("x" * (server._VECTORIZED_MIN_CHARS + 1)))
+        unit = "  One two.. three?\x1cFour\x0bfive ! .\t. six\n"
+        texts = [
+            (unit * (server._VECTORIZED_MIN_CHARS // len(unit) + 2)),
+            # Starting and ending mid-word, with no trailing terminator
+            "start" + unit * (server._VECTORIZED_MIN_CHARS // len(unit) + 2) + "tail",
+            # Control bytes that are not whitespace must not split words or sentences
+            "a\x00b. c\x1bd " * (server._VECTORIZED_MIN_CHARS // len("a\x00b. c\x1bd ") + 2),
+        ]
+        for text in texts:
+            with self.subTest(length=len(text)):
+                self.assertTrue(server._use_vectorized(text))
+                self.assertEqual(server._count_sentences(text), _baseline_sentences(text))
+                self.assertEqual(server._count_words(text), _baseline_words(text))
+
+
+class LargeInputOverStdioTest(unittest.TestCase):
+    """Drives inputs over the offload threshold through the real stdio server."""
+
+    async def _call_large_tools(self):
+        params = StdioServerParameters(command=sys.executable, args=[SERVER_PATH])
+        async with stdio_client(params) as (read_stream, write_stream):
+            async with ClientSession(read_stream, write_stream) as session:
+                await session.initialize()
+                analysis = await session.call_tool("analyze_text", {"text": LARGE_TEXT})
+                sentences = await session.call_tool("count_sentences", {"text": LARGE_TEXT})
+        return analysis, sentences
+
+    def test_large_inputs_return_and_server_shuts_down(self):
+        # Run in a daemon thread so a hang fails the test instead of blocking it forever. The time
+        # limit covers the server shutdown too: workers holding the transport open would stall it.
+        results = []
+        client_thread = threading.Thread(target=lambda: results.append(asyncio.run(self._call_large_tools())), daemon=True)
+        client_thread.start()
+        client_thread.join(timeout=60)
+        self.assertFalse(client_thread.is_alive(), "large tool call or server shutdown hung")
+        self.assertTrue(results, "client session failed")
+        analysis, sentences = results[0]
+        self.assertFalse(analysis.isError)
+        self.assertIn(f'"word_count": {len(LARGE_TEXT.split())}', analysis.content[0].text)
+        self.assertFalse(sentences.isError)
+        # Baseline split/strip count, independent of the server's implementation
+        expected_sentences = len([s for s in re.split(r'[.?!]+', LARGE_TEXT) if s.strip()])
+        self.assertEqual(int(sentences.content[0].text), expected_sentences)
+
+
+class BrokenPoolRecoveryTest(unittest.TestCase):
+    """A crashed worker must not break every later large input."""
+
+    def setUp(self):
+        self._sigterm_handler = signal.getsignal(signal.SIGTERM)
+
+    def tearDown(self):
+        # Nothing in the server should touch this process's signal handlers; restore them regardless
+        signal.signal(signal.SIGTERM, self._sigterm_handler)
+        if server._executor is not None:
+            server._executor.shutdown()
+            server._executor = None
+
+    def test_broken_pool_is_replaced(self):
+        with self.assertRaises(BrokenProcessPool):
+            asyncio.run(server._run_counter(_crash_worker, LARGE_TEXT))
+        self.assertIsNone(server._executor)
+        word_count = asyncio.run(server._run_counter(server._count_words, LARGE_TEXT))
+        self.assertEqual(word_count, len(LARGE_TEXT.split()))
+
+
+if __name__ == "__main__":
+    unittest.main()